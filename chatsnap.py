@@ -1,7 +1,4 @@
 import keyboard
-import pyperclip
-import speech_recognition as sr
-import openai
 import json
 import sys
 import threading
@@ -12,9 +9,10 @@ from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
 from PyQt6.QtCore import Qt, QThread, pyqtSignal, QSize, QSettings, QDateTime
 from PyQt6.QtGui import QIcon, QAction, QFont, QPalette, QColor
 import sounddevice as sd
+from chatsnap_core import ChatSnapCore
 
 class AudioCaptureThread(QThread):
-    finished = pyqtSignal(str)
+    finished = pyqtSignal(str, dict)
     status = pyqtSignal(str)
 
     def __init__(self, chatsnap):
@@ -25,14 +23,11 @@ class AudioCaptureThread(QThread):
         self.status.emit("Listening...")
         audio = self.chatsnap.capture_audio()
         if audio:
-            text = self.chatsnap.transcribe_audio(audio)
-            if text:
-                processed_text = self.chatsnap.process_text(text)
-                if processed_text:
-                    self.chatsnap.copy_to_clipboard(processed_text)
-                    self.finished.emit(processed_text)
-                    self.status.emit("Ready")
-                    return
+            record = {}
+            processed_text = self.chatsnap.run_pipeline(audio, self.status.emit, record)
+            if processed_text:
+                self.chatsnap.copy_to_clipboard(processed_text)
+                self.finished.emit(processed_text, record)
         self.status.emit("Ready")
 
 class ChatSnapGUI(QMainWindow):
@@ -391,6 +386,16 @@ class ChatSnapGUI(QMainWindow):
         lang_layout.addWidget(self.lang_input)
         layout.addLayout(lang_layout)
 
+        # Spoken language lets the pipeline pick cheaper stage sequences
+        speech_layout = QHBoxLayout()
+        speech_label = QLabel("Spoken Language:")
+        self.speech_input = QLineEdit(self.chatsnap.config.get('speech_language', ''))
+        self.speech_input.setPlaceholderText("Language you speak (optional, enables faster processing)")
+        self.speech_input.textChanged.connect(self.save_settings)
+        speech_layout.addWidget(speech_label)
+        speech_layout.addWidget(self.speech_input)
+        layout.addLayout(speech_layout)
+
         parent_layout.addWidget(group)
 
     def create_ai_section(self, parent_layout):
@@ -520,12 +525,10 @@ class ChatSnapGUI(QMainWindow):
             'model': self.model_combo.currentData(),
             'microphone_index': self.mic_combo.currentData(),
             'game': self.game_input.text(),
-            'language': self.lang_input.text()
+            'language': self.lang_input.text(),
+            'speech_language': self.speech_input.text()
         })
-        
-        config_path = Path.home() / '.chatsnap' / 'config.json'
-        with open(config_path, 'w') as f:
-            json.dump(self.chatsnap.config, f, indent=4)
+        self.chatsnap.save_config()
         
         # Update OpenAI settings
         self.chatsnap.setup_openai()
@@ -537,9 +540,19 @@ class ChatSnapGUI(QMainWindow):
             self.capture_thread.status.connect(self.update_status)
             self.capture_thread.start()
 
-    def update_last_text(self, text):
+    def update_last_text(self, text, record=None):
         current_time = QDateTime.currentDateTime().toString("hh:mm:ss")
-        self.last_text_label.setText(f"[{current_time}]\n{text}\n\n{self.last_text_label.text()}")
+        header = f"[{current_time}]"
+        if record:
+            # Show which stages ran so the time saved by the fast paths is visible
+            header += f" {record['plan']} in {record['total']:.1f}s"
+            tokens = record.get('tokens')
+            if tokens:
+                input_tokens = tokens['input'] if tokens['input'] is not None else tokens['estimated_input']
+                header += f", {input_tokens} in / {tokens['output']} out tokens"
+            if record.get('truncated'):
+                header += " (truncated)"
+        self.last_text_label.setText(f"{header}\n{text}\n\n{self.last_text_label.text()}")
 
     def update_status(self, status):
         self.status_label.setText(status)
@@ -575,145 +588,27 @@ class ChatSnapGUI(QMainWindow):
         else:
             self.setMinimumWidth(600)  # Original width
 
-class ChatSnap:
+class ChatSnap(ChatSnapCore):
     def __init__(self):
-        self.config = self.load_config()
-        self.recognizer = sr.Recognizer()
-        self.is_listening = False
-        self.setup_openai()
+        super().__init__()
         
         # Initialize GUI
         self.app = QApplication(sys.argv)
         self.app.setWindowIcon(QIcon("chatsnapicon.png"))  # Set app-wide icon
         self.gui = ChatSnapGUI(self)
         
-    def load_config(self):
-        default_config = {
-            'hotkey': 'ctrl+shift+m',
-            'tone': 'friendly',
-            'openai_api_key': '',
-            'language': 'English',
-            'microphone_index': 0,
-            'model': 'gpt-4o',
-            'models_list': [
-                'gpt-4o',           # Latest GPT-4o
-                'gpt-4o-mini',      # GPT-4o Mini
-                'o1-mini',          # OpenAI 1 Mini
-            ],
-            'whisper_model': 'whisper-1'
-        }
-        
-        config_path = Path.home() / '.chatsnap' / 'config.json'
-        
-        try:
-            if config_path.exists():
-                with open(config_path, 'r') as f:
-                    current_config = json.load(f)
-                    
-                    # Always update the models list and ensure model is valid
-                    current_config['models_list'] = default_config['models_list']
-                    if current_config.get('model') not in default_config['models_list']:
-                        current_config['model'] = default_config['model']
-                    
-                    # Update config file with new models
-                    with open(config_path, 'w') as f:
-                        json.dump({**default_config, **current_config}, f, indent=4)
-                    
-                    return {**default_config, **current_config}
-            else:
-                config_path.parent.mkdir(parents=True, exist_ok=True)
-                with open(config_path, 'w') as f:
-                    json.dump(default_config, f, indent=4)
-                return default_config
-        except Exception as e:
-            print(f"Error loading config: {e}")
-            return default_config
-
-    def setup_openai(self):
-        openai.api_key = self.config['openai_api_key']
-
-    def capture_audio(self):
-        with sr.Microphone(device_index=self.config['microphone_index']) as source:
-            print("Listening...")
-            self.is_listening = True
-            try:
-                # Adjust for ambient noise
-                self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                audio = self.recognizer.listen(source, timeout=5)
-                return audio
-            except sr.WaitTimeoutError:
-                print("No speech detected")
-                return None
-            finally:
-                self.is_listening = False
-
-    def transcribe_audio(self, audio):
-        try:
-            temp_path = Path.home() / '.chatsnap' / 'temp.wav'
-            temp_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            with open(temp_path, 'wb') as f:
-                f.write(audio.get_wav_data())
-            
-            with open(temp_path, 'rb') as audio_file:
-                response = openai.Audio.transcribe(
-                    self.config['whisper_model'],  # Use configured whisper model
-                    audio_file
-                )
-            
-            temp_path.unlink()
-            return response['text']
-        except Exception as e:
-            print(f"Error transcribing audio: {e}")
-            return None
-
-    def process_text(self, text):
-        if not text:
-            return None
-            
-        game_context = f"in the game {self.config['game']}" if self.config.get('game') else "in a gaming context"
-        
-        prompt = f"""
-        Rewrite the following message in a {self.config['tone']}, concise way, 
-        suitable for chat {game_context}. Keep the core message but make it brief and clear.
-        Respond in {self.config['language']}.
-        
-        Message: {text}
-        """
-        
-        try:
-            response = openai.ChatCompletion.create(
-                model=self.config['model'],
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": f"You are a helpful assistant that rewrites messages to be concise and appropriate for {game_context}. Always respond in {self.config['language']}."
-                    },
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            print(f"Error processing text with AI: {e}")
-            return None
-
-    def copy_to_clipboard(self, text):
-        if text:
-            pyperclip.copy(text)
-            print(f"Copied to clipboard: {text}")
-
     def handle_hotkey(self):
         if self.is_listening:
             return
         try:
             audio = self.capture_audio()
             if audio:
-                text = self.transcribe_audio(audio)
-                if text:
-                    processed_text = self.process_text(text)
+                record = {}
+                processed_text = self.run_pipeline(audio, record=record)
+                if processed_text:
                     self.copy_to_clipboard(processed_text)
                     # Update GUI history
-                    self.gui.update_last_text(processed_text)
+                    self.gui.update_last_text(processed_text, record)
         except Exception as e:
             print(f"Error in hotkey handler: {e}")
 
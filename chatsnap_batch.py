@@ -0,0 +1,136 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from pathlib import Path
+import speech_recognition as sr
+from chatsnap_core import ChatSnapCore
+
+AUDIO_SUFFIXES = {'.wav', '.flac'}
+
+def decode_file(path, sample_rate=16000):
+    """Decode a clip to 16-bit mono PCM at Whisper's native rate. Runs in a worker process."""
+    with sr.AudioFile(path) as source:
+        audio = sr.Recognizer().record(source)
+    convert_rate = sample_rate if audio.sample_rate > sample_rate else None
+    return audio.get_raw_data(convert_rate=convert_rate, convert_width=2), convert_rate or audio.sample_rate, 2
+
+class ChatSnapBatch(ChatSnapCore):
+    def load_done(self, output_path):
+        """Files that already have a result in the output, so an interrupted run can resume."""
+        done = set()
+        if output_path.exists():
+            with open(output_path, 'r') as f:
+                for line in f:
+                    try:
+                        result = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Partial line from an interrupted run
+                    # Lines that are not ChatSnap results are ignored
+                    if isinstance(result, dict) and result.get('file') and not result.get('error'):
+                        done.add(result['file'])
+        return done
+
+    def pending_files(self, directory, done):
+        for path in directory.rglob('*'):
+            # Results are keyed relative to the directory so resuming works from any working directory
+            if path.suffix.lower() in AUDIO_SUFFIXES and path.relative_to(directory).as_posix() not in done:
+                yield path
+
+    def process_clip(self, frames, sample_rate, sample_width):
+        audio = sr.AudioData(frames, sample_rate, sample_width)
+        record = {'duration': len(frames) / (sample_rate * sample_width)}
+        text = self.run_pipeline(audio, record=record)
+        if not text:
+            record['error'] = "Rewrite failed" if record.get('transcript') else "No transcript"
+        return text, record
+
+    def process_directory(self, directory, output_path, workers=4, decoders=None):
+        done = self.load_done(output_path)
+        if done:
+            print(f"Resuming, skipping {len(done)} processed files")
+        files = self.pending_files(directory, done)
+        decoders = decoders or os.cpu_count() or 1
+        # Only this many clips are decoded or in flight at once, however large the directory
+        max_in_flight = workers + decoders
+
+        processed = failed = 0
+        started = time.perf_counter()
+        pending = {}
+        decode_pool = ProcessPoolExecutor(max_workers=decoders)
+        pipeline_pool = ThreadPoolExecutor(max_workers=workers)
+
+        def fill():
+            while len(pending) < max_in_flight:
+                path = next(files, None)
+                if path is None:
+                    return
+                pending[decode_pool.submit(decode_file, str(path))] = ('decode', path)
+
+        with open(output_path, 'a') as output:
+            def write(path, text, record):
+                nonlocal processed, failed
+                result = {'file': path.relative_to(directory).as_posix(), 'text': text, **record}
+                output.write(json.dumps(result) + '\n')
+                output.flush()
+                processed += 1
+                failed += 'error' in record
+
+            try:
+                fill()
+                while pending:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        stage, path = pending.pop(future)
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            result = (None, {'error': f"Error during {stage}: {e}"})
+                            stage = 'pipeline'
+
+                        if stage == 'decode':
+                            # Hand the decoded clip to the network stages while other files keep decoding
+                            pending[pipeline_pool.submit(self.process_clip, *result)] = ('pipeline', path)
+                            continue
+
+                        write(path, *result)
+                        if processed % 25 == 0:
+                            elapsed = time.perf_counter() - started
+                            print(f"Processed {processed} files ({processed / elapsed:.2f} files/s)")
+                    fill()
+            except KeyboardInterrupt:
+                print("Interrupted, cancelling queued clips")
+                for future in pending:
+                    future.cancel()
+                # Clips already in their API calls have been paid for, so keep their results
+                for future, (stage, path) in pending.items():
+                    if stage == 'pipeline' and not future.cancelled():
+                        try:
+                            write(path, *future.result())
+                        except Exception:
+                            pass
+            finally:
+                decode_pool.shutdown(cancel_futures=True)
+                pipeline_pool.shutdown(cancel_futures=True)
+
+        elapsed = time.perf_counter() - started
+        rate = processed / elapsed if elapsed else 0.0
+        print(f"Done: {processed} files, {failed} failed in {elapsed:.1f}s ({rate:.2f} files/s)")
+        return processed, failed
+
+def main():
+    parser = argparse.ArgumentParser(description="Run ChatSnap's transcribe and rewrite pipeline over audio files.")
+    parser.add_argument('directory', type=Path, help="directory searched recursively for WAV/FLAC files")
+    parser.add_argument('-o', '--output', type=Path, default=Path('chatsnap_results.jsonl'),
+                        help="JSONL results file, appended to and used to resume (default: %(default)s)")
+    parser.add_argument('-w', '--workers', type=int, default=4, help="clips in the network stages at once")
+    parser.add_argument('-d', '--decoders', type=int, help="decoding processes (default: CPU count)")
+    args = parser.parse_args()
+
+    if not args.directory.is_dir():
+        parser.error(f"Not a directory: {args.directory}")
+    ChatSnapBatch().process_directory(args.directory, args.output, args.workers, args.decoders)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+import pyperclip
+import speech_recognition as sr
+import openai
+import audioop
+import io
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None  # Token counts fall back to a character-based estimate
+
+class PromptTemplates:
+    """Rewrite prompts compiled once for a given set of settings."""
+
+    SYSTEM = ("Rewrite the user's message in a {tone}, concise way, suitable for chat {game_context}. "
+              "Keep the core message but make it brief and clear. Respond in {language}.")
+    USER = "Message: {text}"  # Marks the transcript as text to rewrite, not a question to answer
+    MESSAGE_OVERHEAD = 4  # Tokens the chat format adds around each message
+    REPLY_OVERHEAD = 3
+
+    def __init__(self, config):
+        game_context = f"in the game {config['game']}" if config.get('game') else "in a gaming context"
+        self.system = self.SYSTEM.format(tone=config['tone'], game_context=game_context,
+                                         language=config['language'])
+        self.max_input_tokens = config['max_input_tokens']
+        self.encoding = self.load_encoding(config['model'])
+        self.fixed_tokens = (self.count_tokens(self.system) + self.count_tokens(self.USER.format(text=''))
+                             + 2 * self.MESSAGE_OVERHEAD + self.REPLY_OVERHEAD)
+
+    @staticmethod
+    def settings_key(config):
+        return (config['tone'], config.get('game'), config['language'], config['model'],
+                config['max_input_tokens'])
+
+    @staticmethod
+    def load_encoding(model):
+        if tiktoken is None:
+            return None
+        try:
+            try:
+                return tiktoken.encoding_for_model(model)
+            except KeyError:
+                return tiktoken.get_encoding('o200k_base')
+        except Exception as e:
+            print(f"Error loading tokenizer, estimating token counts: {e}")
+            return None
+
+    def count_tokens(self, text):
+        if self.encoding:
+            return len(self.encoding.encode(text))
+        return -(-len(text) // 4)  # Roughly four characters per token
+
+    def truncate(self, text, max_tokens):
+        if self.encoding:
+            tokens = self.encoding.encode(text)
+            return self.encoding.decode(tokens[:max_tokens]) if len(tokens) > max_tokens else text
+        return text[:max_tokens * 4]
+
+    def build_messages(self, text):
+        """Return the chat messages for text, their estimated input token count and whether text was cut."""
+        budget = max(1, self.max_input_tokens - self.fixed_tokens)
+        truncated = self.count_tokens(text) > budget
+        if truncated:
+            print(f"Transcript exceeds the {self.max_input_tokens} token budget, truncating")
+            text = self.truncate(text, budget)
+        messages = [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.USER.format(text=text)}
+        ]
+        return messages, self.fixed_tokens + self.count_tokens(text), truncated
+
+
+class ChatSnapCore:
+    """Capture, transcription and rewrite pipeline, usable without the GUI."""
+
+    def __init__(self):
+        self.config = self.load_config()
+        self.recognizer = sr.Recognizer()
+        self.is_listening = False
+        self.pipeline_history = deque(maxlen=100)
+        self.prompts = None
+        self.prompts_key = None
+        self.prompts_lock = threading.Lock()
+        self.setup_openai()
+
+    def load_config(self):
+        default_config = {
+            'hotkey': 'ctrl+shift+m',
+            'tone': 'friendly',
+            'openai_api_key': '',
+            'language': 'English',
+            'speech_language': '',          # Empty means unknown, always rewrite
+            'fast_path_max_words': 12,      # Casual messages up to this length skip the rewrite
+            'microphone_index': 0,
+            'model': 'gpt-4o',
+            'models_list': [
+                'gpt-4o',           # Latest GPT-4o
+                'gpt-4o-mini',      # GPT-4o Mini
+                'o1-mini',          # OpenAI 1 Mini
+            ],
+            'whisper_model': 'whisper-1',
+            'max_input_tokens': 2000,       # Only runaway transcripts are truncated before the rewrite
+            'segment_max_seconds': 10,      # Longer recordings are split at silence
+            'transcribe_workers': 4,
+            'daemon_port': 47813,           # localhost port for chatsnap_daemon.py
+            'max_recording_seconds': 120,   # Daemon recordings stop here if "stop" never arrives
+            'daemon_token': ''              # Generated on first daemon start
+        }
+        
+        config_path = Path.home() / '.chatsnap' / 'config.json'
+        self.config_loaded = False  # Never write defaults over a config that failed to load
+        
+        try:
+            if config_path.exists():
+                with open(config_path, 'r') as f:
+                    current_config = json.load(f)
+                    
+                    # Always update the models list and ensure model is valid
+                    current_config['models_list'] = default_config['models_list']
+                    if current_config.get('model') not in default_config['models_list']:
+                        current_config['model'] = default_config['model']
+                    
+                    # Update config file with new models
+                    with open(config_path, 'w') as f:
+                        json.dump({**default_config, **current_config}, f, indent=4)
+                    
+                    self.config_loaded = True
+                    return {**default_config, **current_config}
+            else:
+                config_path.parent.mkdir(parents=True, exist_ok=True)
+                with open(config_path, 'w') as f:
+                    json.dump(default_config, f, indent=4)
+                self.config_loaded = True
+                return default_config
+        except Exception as e:
+            print(f"Error loading config: {e}")
+            return default_config
+
+    def read_saved_config(self):
+        try:
+            with open(Path.home() / '.chatsnap' / 'config.json', 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error reading config: {e}")
+            return None
+
+    def save_config(self):
+        # The daemon may have generated a token since this config was loaded
+        saved = self.read_saved_config() or {}
+        if saved.get('daemon_token'):
+            self.config['daemon_token'] = saved['daemon_token']
+        config_path = Path.home() / '.chatsnap' / 'config.json'
+        with open(config_path, 'w') as f:
+            json.dump(self.config, f, indent=4)
+
+    def setup_openai(self):
+        openai.api_key = self.config['openai_api_key']
+
+    def capture_audio(self):
+        with sr.Microphone(device_index=self.config['microphone_index']) as source:
+            print("Listening...")
+            self.is_listening = True
+            try:
+                # Adjust for ambient noise
+                self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
+                audio = self.recognizer.listen(source, timeout=5)
+                return audio
+            except sr.WaitTimeoutError:
+                print("No speech detected")
+                return None
+            finally:
+                self.is_listening = False
+
+    def split_audio(self, audio, frame_ms=20, silence_ms=200):
+        """Split audio into chunks of at most segment_max_seconds, cutting at the quietest point."""
+        frame_bytes = (audio.sample_rate * frame_ms // 1000) * audio.sample_width
+        max_frames = int(self.config['segment_max_seconds'] * 1000) // frame_ms
+        total_frames = -(-len(audio.frame_data) // frame_bytes)
+        if total_frames <= max_frames:
+            return [audio]
+
+        energies = [audioop.rms(audio.frame_data[i:i + frame_bytes], audio.sample_width)
+                    for i in range(0, len(audio.frame_data), frame_bytes)]
+        window = max(1, silence_ms // frame_ms)
+
+        segments = []
+        start = 0
+        while total_frames - start > max_frames:
+            # Look for the quietest stretch in the second half of the allowed span
+            lo = start + max_frames // 2
+            hi = start + max_frames - window
+            run = sum(energies[lo:lo + window])
+            best, best_run = lo, run
+            for i in range(lo + 1, hi + 1):
+                run += energies[i + window - 1] - energies[i - 1]
+                if run < best_run:
+                    best, best_run = i, run
+            cut = best + window // 2
+            segments.append(sr.AudioData(audio.frame_data[start * frame_bytes:cut * frame_bytes],
+                                         audio.sample_rate, audio.sample_width))
+            start = cut
+        segments.append(sr.AudioData(audio.frame_data[start * frame_bytes:],
+                                     audio.sample_rate, audio.sample_width))
+        return segments
+
+    def transcribe_segment(self, audio, prompt=None, translate=False):
+        audio_file = io.BytesIO(audio.get_wav_data())
+        audio_file.name = 'audio.wav'  # Whisper infers the format from the file name
+        kwargs = {'prompt': prompt} if prompt else {}
+        endpoint = openai.Audio.translate if translate else openai.Audio.transcribe
+        response = endpoint(
+            self.config['whisper_model'],  # Use configured whisper model
+            audio_file,
+            **kwargs
+        )
+        return response['text'].strip()
+
+    def transcribe_audio(self, audio, translate=False):
+        try:
+            segments = self.split_audio(audio)
+            # Chunks run concurrently, so they share the game name as context
+            # instead of waiting on each other's transcripts
+            prompt = self.config.get('game') or None
+            if len(segments) == 1:
+                return self.transcribe_segment(segments[0], prompt, translate)
+
+            workers = min(len(segments), self.config['transcribe_workers'])
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                texts = list(pool.map(lambda segment: self.transcribe_segment(segment, prompt, translate),
+                                      segments))
+            print(f"Transcribed {len(segments)} segments with {workers} workers")
+            return ' '.join(text for text in texts if text)
+        except Exception as e:
+            print(f"Error transcribing audio: {e}")
+            return None
+
+    def plan_pipeline(self):
+        """Pick the speech endpoint; whether to rewrite is decided once the transcript is known."""
+        target = self.config.get('language', 'English').strip().lower()
+        spoken = self.config.get('speech_language', '').strip().lower()
+        # Whisper's translate endpoint always produces English
+        if target == 'english' and spoken and spoken != 'english':
+            return 'translate'
+        return 'transcribe'
+
+    def needs_rewrite(self, text, speech_stage):
+        if self.config['tone'] != 'casual':
+            return True
+        if len(text.split()) > self.config['fast_path_max_words']:
+            return True
+        # Short casual messages can be used as-is once they are in the target language
+        target = self.config.get('language', 'English').strip().lower()
+        spoken = self.config.get('speech_language', '').strip().lower()
+        return not (speech_stage == 'translate' or spoken == target)
+
+    def run_pipeline(self, audio, on_status=None, record=None):
+        """Run the cheapest stage sequence for the current settings and record its timings."""
+        on_status = on_status or (lambda status: None)
+        speech_stage = self.plan_pipeline()
+        record = {} if record is None else record
+        record['stages'] = {}
+        started = time.perf_counter()
+
+        on_status("Translating..." if speech_stage == 'translate' else "Transcribing...")
+        text = self.transcribe_audio(audio, translate=speech_stage == 'translate')
+        record['stages'][speech_stage] = time.perf_counter() - started
+        record['transcript'] = text
+        processed_text = None
+        if text:
+            processed_text = text
+            if self.needs_rewrite(text, speech_stage):
+                on_status("Rewriting...")
+                rewrite_started = time.perf_counter()
+                processed_text = self.process_text(text, record, on_status)
+                record['stages']['rewrite'] = time.perf_counter() - rewrite_started
+
+        record['plan'] = '+'.join(record['stages'])
+        record['total'] = time.perf_counter() - started
+        self.pipeline_history.append(record)
+        timings = ', '.join(f"{stage} {seconds:.2f}s" for stage, seconds in record['stages'].items())
+        print(f"Pipeline {record['plan']}: {timings} (total {record['total']:.2f}s)")
+        return processed_text
+
+    def get_prompts(self):
+        # Recompile only when a setting that feeds the prompt has changed
+        key = PromptTemplates.settings_key(self.config)
+        with self.prompts_lock:
+            if self.prompts is None or self.prompts_key != key:
+                self.prompts = PromptTemplates(self.config)
+                self.prompts_key = key
+            return self.prompts
+
+    def process_text(self, text, record=None, on_status=None):
+        if not text:
+            return None
+
+        try:
+            messages, estimated_tokens, truncated = self.get_prompts().build_messages(text)
+            if truncated:
+                if record is not None:
+                    record['truncated'] = True
+                if on_status:
+                    on_status(f"Message too long, rewriting the first {self.config['max_input_tokens']} tokens...")
+            response = openai.ChatCompletion.create(
+                model=self.config['model'],
+                messages=messages
+            )
+            usage = response.get('usage', {})
+            tokens = {
+                'estimated_input': estimated_tokens,
+                'input': usage.get('prompt_tokens'),
+                'output': usage.get('completion_tokens')
+            }
+            if record is not None:
+                record['tokens'] = tokens
+            print(f"Tokens: {tokens['input']} input (estimated {estimated_tokens}), {tokens['output']} output")
+            return response.choices[0].message.content.strip()
+        except Exception as e:
+            print(f"Error processing text with AI: {e}")
+            return None
+
+    def copy_to_clipboard(self, text):
+        if text:
+            pyperclip.copy(text)
+            print(f"Copied to clipboard: {text}")
@@ -0,0 +1,224 @@
+import argparse
+import base64
+import hmac
+import io
+import json
+import secrets
+import socket
+import socketserver
+import threading
+from pathlib import Path
+import speech_recognition as sr
+from chatsnap_core import ChatSnapCore
+
+class ChatSnapDaemon(ChatSnapCore):
+    def __init__(self):
+        super().__init__()
+        self.ensure_token()
+        self.recording_thread = None
+        self.recording_lock = threading.Lock()
+        self.stop_recording_event = threading.Event()
+        self.frames = []
+        self.recording_format = None
+        self.recording_owner = None
+
+    def ensure_token(self):
+        # TCP clients must send this token, so web pages can't drive the daemon
+        if self.config.get('daemon_token'):
+            return
+        saved = self.read_saved_config() if self.config_loaded else None
+        if saved is None:
+            self.config['daemon_token'] = secrets.token_urlsafe(24)
+            print(f"Config could not be loaded, using a temporary daemon token: {self.config['daemon_token']}")
+            return
+        if not saved.get('daemon_token'):
+            # Only add the token, so settings saved by the GUI in the meantime are kept
+            saved['daemon_token'] = secrets.token_urlsafe(24)
+            config_path = Path.home() / '.chatsnap' / 'config.json'
+            with open(config_path, 'w') as f:
+                json.dump(saved, f, indent=4)
+            print(f"Generated daemon token in {config_path}")
+        self.config['daemon_token'] = saved['daemon_token']
+
+    def start_recording(self, owner=None):
+        with self.recording_lock:
+            if self.is_listening or (self.recording_thread and self.recording_thread.is_alive()):
+                raise RuntimeError("Already recording")
+            self.frames = []
+            self.recording_format = None
+            self.recording_owner = owner
+            self.stop_recording_event.clear()
+            ready = threading.Event()
+            self.recording_thread = threading.Thread(target=self.record, args=(ready,), daemon=True)
+            self.recording_thread.start()
+        ready.wait()
+
+    def record(self, ready):
+        try:
+            with sr.Microphone(device_index=self.config['microphone_index']) as source:
+                self.is_listening = True
+                self.recording_format = (source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+                ready.set()
+                # Stop on our own if the client never sends "stop"
+                max_chunks = self.config['max_recording_seconds'] * source.SAMPLE_RATE // source.CHUNK
+                while not self.stop_recording_event.is_set():
+                    self.frames.append(source.stream.read(source.CHUNK))
+                    if len(self.frames) >= max_chunks:
+                        print(f"Recording reached {self.config['max_recording_seconds']}s, stopping")
+                        break
+        except Exception as e:
+            print(f"Error recording audio: {e}")
+        finally:
+            self.is_listening = False
+            ready.set()
+
+    def stop_recording(self):
+        with self.recording_lock:
+            if not self.recording_thread:
+                raise RuntimeError("Not recording")
+            self.stop_recording_event.set()
+            self.recording_thread.join()
+            self.recording_thread = None
+            self.recording_owner = None
+        if not self.recording_format or not self.frames:
+            return None
+        sample_rate, sample_width = self.recording_format
+        return sr.AudioData(b''.join(self.frames), sample_rate, sample_width)
+
+    def cancel_recording(self, owner):
+        with self.recording_lock:
+            if not self.recording_thread or self.recording_owner is not owner:
+                return
+            self.stop_recording_event.set()
+            self.recording_thread.join()
+            self.recording_thread = None
+            self.recording_owner = None
+            self.frames = []
+        print("Client disconnected, discarded its recording")
+
+    def decode_audio(self, data):
+        with sr.AudioFile(io.BytesIO(data)) as source:
+            return self.recognizer.record(source)
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+    disable_nagle_algorithm = True
+
+    def send(self, event, **fields):
+        self.wfile.write(json.dumps({'event': event, **fields}).encode() + b'\n')
+
+    def handle(self):
+        try:
+            self.handle_lines()
+        finally:
+            # A recording nobody can stop any more would hold the microphone forever
+            self.server.chatsnap.cancel_recording(self)
+
+    def handle_lines(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    request = None
+                # Anything else, such as an HTTP request from a browser, ends the connection
+                if not isinstance(request, dict):
+                    self.send('error', error="Expected one JSON object per line")
+                    break
+                if not self.authorized(request):
+                    self.send('error', error="Invalid token")
+                    break
+                if not self.dispatch(request):
+                    break
+            except (BrokenPipeError, ConnectionResetError):
+                break
+            except Exception as e:
+                self.send('error', error=str(e))
+
+    def authorized(self, request):
+        token = self.server.token
+        if token is None:
+            return True
+        return hmac.compare_digest(str(request.get('token', '')).encode(), token.encode())
+
+    def dispatch(self, request):
+        chatsnap = self.server.chatsnap
+        cmd = request.get('cmd')
+        if cmd == 'ping':
+            self.send('pong')
+        elif cmd == 'start':
+            chatsnap.start_recording(self)
+            if not chatsnap.is_listening:
+                raise RuntimeError("Could not open microphone")
+            self.send('recording')
+        elif cmd == 'stop':
+            self.run_pipeline(request, chatsnap.stop_recording())
+        elif cmd == 'capture':
+            if chatsnap.is_listening:
+                raise RuntimeError("Already recording")
+            self.send('status', status="Listening...")
+            self.run_pipeline(request, chatsnap.capture_audio())
+        elif cmd == 'submit':
+            self.run_pipeline(request, chatsnap.decode_audio(base64.b64decode(request['audio'])))
+        elif cmd == 'history':
+            self.send('history', records=list(chatsnap.pipeline_history))
+        elif cmd == 'shutdown':
+            self.send('shutdown')
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return False
+        else:
+            raise ValueError(f"Unknown command: {cmd}")
+        return True
+
+    def run_pipeline(self, request, audio):
+        chatsnap = self.server.chatsnap
+        if not audio:
+            self.send('result', text=None, error="No speech detected")
+            return
+        record = {}
+        text = chatsnap.run_pipeline(audio, lambda status: self.send('status', status=status), record)
+        if text and request.get('clipboard', True):
+            chatsnap.copy_to_clipboard(text)
+        self.send('result', text=text, record=record)
+
+class TCPDaemonServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+if hasattr(socket, 'AF_UNIX'):
+    class UnixDaemonServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+def main():
+    parser = argparse.ArgumentParser(description="Run ChatSnap headless with a local socket API.")
+    parser.add_argument('--port', type=int, help="localhost TCP port (default: daemon_port from config)")
+    parser.add_argument('--socket', help="listen on this Unix socket path instead of TCP")
+    args = parser.parse_args()
+
+    chatsnap = ChatSnapDaemon()
+    if args.socket:
+        if not hasattr(socket, 'AF_UNIX'):
+            parser.error("Unix sockets are not supported on this platform")
+        server = UnixDaemonServer(args.socket, DaemonRequestHandler)
+        server.token = None  # Access is controlled by the socket file's permissions
+        address = args.socket
+    else:
+        port = args.port or chatsnap.config['daemon_port']
+        server = TCPDaemonServer(('127.0.0.1', port), DaemonRequestHandler)
+        server.token = chatsnap.config['daemon_token']
+        address = f"127.0.0.1:{port}"
+    server.chatsnap = chatsnap
+
+    print(f"ChatSnap daemon listening on {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket:
+            Path(args.socket).unlink(missing_ok=True)
+
+if __name__ == "__main__":
+    main()